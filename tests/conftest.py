@@ -0,0 +1,59 @@
+import asyncio
+import json
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from visualizer_server_firebase import FitnessRelayServer
+
+
+class FakeConnection:
+    """In-memory websocket: feed() queues inbound messages, sent collects outbound ones"""
+
+    def __init__(self):
+        self.open = True
+        self.sent = []
+        self.close_code = None
+        self.inbox = asyncio.Queue()
+
+    def feed(self, *messages):
+        for message in messages:
+            self.inbox.put_nowait(message)
+
+    async def send(self, message):
+        self.sent.append(message)
+
+    async def close(self, code=1000, reason=""):
+        self.open = False
+        self.close_code = code
+        self.inbox.put_nowait(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self.inbox.get()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+
+async def connect_device(server, device_id="dev1", **registration):
+    """Open a FakeConnection and register it as device_id; extra fields go into the device_register message"""
+    websocket = FakeConnection()
+    await server.on_connect(websocket)
+    await server.handle_message(websocket, json.dumps({"type": "device_register", "deviceId": device_id, **registration}))
+    return websocket
+
+
+@pytest.fixture
+def server(monkeypatch):
+    # Tests must not probe for cloud credentials or shell out to ipconfig
+    monkeypatch.setattr(FitnessRelayServer, "initialize_firebase", lambda self: None)
+    monkeypatch.setattr(FitnessRelayServer, "get_local_ip", lambda self: "127.0.0.1")
+    relay = FitnessRelayServer()
+    relay.ACCEPT_RATE_LIMIT = (10000, 10000)
+    return relay
@@ -0,0 +1,73 @@
+import asyncio
+import json
+import time
+
+from conftest import FakeConnection, connect_device
+
+
+def pose(device_id):
+    return json.dumps({"type": "pose_data", "deviceId": device_id, "data": {"exerciseType": "squats"}})
+
+
+def test_rate_limit_budget_survives_reconnect(server):
+    async def scenario():
+        first = await connect_device(server, "dev1")
+        verdicts = [server.admit_message(first, pose("dev1"))[0] for _ in range(100)]
+        assert verdicts.count('drop') > 0
+        await server.on_disconnect(first)
+
+        second = await connect_device(server, "dev1")
+        # Same device, same drained bucket - reconnecting must not hand back a fresh burst
+        assert server.admit_message(second, pose("dev1"))[0] != 'accept'
+
+    asyncio.run(scenario())
+
+
+def test_spoofed_type_is_not_dispatched(server):
+    async def scenario():
+        websocket = FakeConnection()
+        await server.on_connect(websocket)
+        spoof = '{"type": "pose_data", "deviceId": "dev1", "type": "device_register"}'
+        verdict, message_type = server.admit_message(websocket, spoof)
+        assert (verdict, message_type) == ('accept', 'pose_data')
+        await server.handle_message(websocket, spoof, message_type)
+        assert "dev1" not in server.device_sessions
+        assert server.admission_stats['type_mismatch'] == 1
+
+    asyncio.run(scenario())
+
+
+def test_full_server_rejects_before_upgrade_without_pacing(server):
+    async def scenario():
+        server.MAX_CONNECTIONS = 2
+        server.ACCEPT_RATE_LIMIT = (1, 1)
+        assert await server.process_request("/", {}) is None
+        for _ in range(2):
+            await server.on_connect(FakeConnection())
+        slot = server._next_accept_slot
+        status, _, _ = await server.process_request("/", {})
+        # Rejected upgrades never take an accept slot
+        assert server._next_accept_slot == slot
+        return status
+
+    assert asyncio.run(scenario()) == 503
+    assert server.admission_stats['rejected_connections'] == 1
+
+
+def test_silent_connections_are_closed_and_free_their_slots(server):
+    async def scenario():
+        server.MAX_CONNECTIONS = 3
+        device = await connect_device(server, "dev1")
+        silent = [FakeConnection() for _ in range(2)]
+        sessions = [asyncio.create_task(server.handler(websocket, "/")) for websocket in silent]
+        await asyncio.sleep(0)
+        assert (await server.process_request("/", {}))[0] == 503
+
+        server.close_unregistered(now=time.monotonic() + server.REGISTRATION_TIMEOUT + 1)
+        await asyncio.gather(*sessions)
+        assert [websocket.close_code for websocket in silent] == [1008, 1008]
+        assert device.close_code is None
+        return await server.process_request("/", {})
+
+    assert asyncio.run(scenario()) is None
+    assert server.admission_stats['registration_timeouts'] == 2
@@ -0,0 +1,98 @@
+import asyncio
+import json
+import time
+
+from conftest import FakeConnection, connect_device
+from visualizer_server_firebase import BiometricAggregator
+
+
+def test_rep_count_never_goes_backwards(server):
+    async def scenario():
+        websocket = await connect_device(server)
+        for reps in range(1, 11):
+            await server.handle_message(websocket, json.dumps({"type": "rep_detection", "data": {"repCount": reps}}))
+            await server.handle_message(websocket, json.dumps({"type": "biometric_data", "data": {"heartRate": 120}}))
+        await server.handle_message(websocket, json.dumps(
+            {"type": "biometric_data", "data": {"heartRate": 121, "repCount": 0}}))
+        return server.device_biometrics["dev1"].summary()
+
+    summary = asyncio.run(scenario())
+    assert summary["repCount"] == 10
+    assert summary["repsPerMinute"] >= 0
+    assert summary["rollingRepsPerMinute"] >= 0
+
+
+def test_reset_allows_counting_from_zero_again():
+    biometrics = BiometricAggregator()
+    biometrics.add_reps(0, 12)
+    biometrics.reset(now=10)
+    biometrics.add_reps(11, 1)
+    assert biometrics.rep_count == 1
+
+
+def test_rolling_heart_rate_ages_out_when_device_goes_quiet():
+    biometrics = BiometricAggregator()
+    biometrics.reset(now=0)
+    for tick in range(120):
+        biometrics.add_heart_rate(tick * 0.5, 100 + tick % 10)
+    assert biometrics.summary(now=60)["rollingHeartRateAvg"] > 0
+
+    quiet = biometrics.summary(now=660)
+    assert (quiet["rollingHeartRateAvg"], quiet["rollingHeartRateMax"]) == (0, 0)
+    assert quiet["rollingRepsPerMinute"] == 0
+
+    biometrics.add_heart_rate(660.5, 150)
+    fresh = biometrics.summary(now=661)
+    assert (fresh["rollingHeartRateAvg"], fresh["rollingHeartRateMin"], fresh["rollingHeartRateMax"]) == (150, 150, 150)
+    assert fresh["heartRateMax"] == 150
+
+
+def test_dashboard_history_serves_raw_and_tiers(server):
+    async def scenario():
+        device = await connect_device(server)
+        biometrics = server.get_biometrics(device)
+        for second in range(30):
+            biometrics.add_heart_rate(second, 100 + second)
+
+        dashboard = FakeConnection()
+        await server.on_connect(dashboard)
+        await server.handle_message(dashboard, '{"type": "dashboard_subscribe"}')
+        replies = {}
+        for resolution in ("raw", 1, 10):
+            await server.handle_message(dashboard, json.dumps(
+                {"type": "dashboard_history", "deviceId": "dev1", "resolution": resolution}))
+            replies[resolution] = json.loads(dashboard.sent[-1])["payload"]["samples"]
+        return replies
+
+    replies = asyncio.run(scenario())
+    assert [sample[1] for sample in replies["raw"]] == [100 + second for second in range(30)]
+    assert len(replies[1]) == 29  # The current second is still open
+    assert [sample[1:] for sample in replies[10]] == [[104.5, 100, 109], [114.5, 110, 119]]
+
+
+def test_stale_device_heart_rate_stops_being_reported():
+    biometrics = BiometricAggregator()
+    biometrics.reset(now=0)
+    biometrics.add_heart_rate(1, 150)
+    assert biometrics.summary(now=30)["heartRate"] == 150
+    assert biometrics.summary(now=3600)["heartRate"] == 0
+
+
+def test_metrics_fall_back_once_device_heart_rate_is_stale(server):
+    async def scenario():
+        websocket = await connect_device(server)
+        biometrics = server.get_biometrics(websocket)
+        server.firebase_data['heartRate'] = 88
+
+        biometrics.add_heart_rate(time.monotonic() - 3600, 150)
+        await server.send_performance_metrics(websocket, "dev1")
+        stale = json.loads(websocket.sent[-1])["payload"]["heartRate"]
+        dashboard = server.build_dashboard_entries()["dev1"]["heartRate"]
+
+        biometrics.add_heart_rate(time.monotonic(), 150)
+        server.firebase_data['heartRate'] = 0
+        await server.send_performance_metrics(websocket, "dev1")
+        fresh = json.loads(websocket.sent[-1])["payload"]["heartRate"]
+        return stale, dashboard, fresh
+
+    assert asyncio.run(scenario()) == (88, 88, 150)
@@ -0,0 +1,76 @@
+import asyncio
+import json
+
+import visualizer_server_firebase as relay
+from conftest import FakeConnection, connect_device
+
+
+def fake_broadcast(calls):
+    def broadcast(connections, message):
+        calls.append(message)
+        for websocket in connections:
+            websocket.sent.append(message)
+    return broadcast
+
+
+def test_subscribers_get_snapshot_then_shared_deltas(server, monkeypatch):
+    calls = []
+    monkeypatch.setattr(relay.websockets, "broadcast", fake_broadcast(calls))
+    builds = []
+    build_entries = server.build_dashboard_entries
+    monkeypatch.setattr(server, "build_dashboard_entries", lambda: builds.append(1) or build_entries())
+    server.DASHBOARD_FULL_SNAPSHOT_EVERY = 3
+
+    async def scenario():
+        await connect_device(server)
+        subscribers = [FakeConnection(), FakeConnection()]
+        for subscriber in subscribers:
+            await server.on_connect(subscriber)
+            await server.handle_message(subscriber, '{"type": "dashboard_subscribe"}')
+        builds.clear()
+
+        await server.select_exercise(1, "squats")
+        server.publish_dashboard_update()  # Delta: exercise changed
+        server.publish_dashboard_update()  # Nothing changed, nothing sent
+        await connect_device(server, "dev2")
+        server.publish_dashboard_update()  # Third update is a full snapshot
+        return subscribers
+
+    first, second = asyncio.run(scenario())
+    assert first.sent == second.sent
+    assert len(calls) == 2 and len(builds) == 3  # One build and one encode per interval, not per subscriber
+    messages = [json.loads(message) for message in first.sent]
+    assert [(message["type"], message["payload"]["seq"]) for message in messages] == [
+        ("dashboard_snapshot", 1), ("dashboard_delta", 2), ("dashboard_snapshot", 3)
+    ]
+    assert messages[1]["payload"]["devices"]["dev1"]["exercise"] == "squats"
+    assert sorted(messages[2]["payload"]["devices"]) == ["dev1", "dev2"]
+
+
+def test_broadcast_loop_survives_a_failed_update(server, monkeypatch):
+    calls = []
+    monkeypatch.setattr(relay.websockets, "broadcast", fake_broadcast(calls))
+    server.DASHBOARD_INTERVAL = 0
+    failures = [RuntimeError("boom")]
+    build_entries = server.build_dashboard_entries
+
+    def flaky_build():
+        if failures:
+            raise failures.pop()
+        return build_entries()
+    monkeypatch.setattr(server, "build_dashboard_entries", flaky_build)
+
+    async def scenario():
+        subscriber = FakeConnection()
+        await server.on_connect(subscriber)
+        server.dashboard_subscribers.add(subscriber)
+        await connect_device(server)
+        loop = server.spawn(server.broadcast_dashboard())
+        for _ in range(5):
+            await asyncio.sleep(0)
+        loop.cancel()
+        return subscriber
+
+    subscriber = asyncio.run(scenario())
+    assert not failures
+    assert [json.loads(message)["type"] for message in subscriber.sent][:1] == ["dashboard_delta"]
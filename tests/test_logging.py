@@ -0,0 +1,63 @@
+import contextlib
+import io
+import json
+import logging
+
+import visualizer_server_firebase as relay
+from visualizer_server_firebase import logger, logging_stats, setup_logging
+
+
+class Unprintable:
+    def __str__(self):
+        raise ValueError("cannot render")
+
+
+@contextlib.contextmanager
+def isolated_logger():
+    """Put the relay logger back afterwards so later tests don't log at INFO"""
+    handlers, level, propagate = logger.handlers[:], logger.level, logger.propagate
+    try:
+        yield
+    finally:
+        logger.handlers[:] = handlers
+        logger.setLevel(level)  # setLevel also clears the logger's isEnabledFor cache
+        logger.propagate = propagate
+
+
+def test_bad_record_does_not_lose_its_batch(capsys):
+    stream = io.StringIO()
+    with isolated_logger():
+        writer = setup_logging("INFO", stream=stream)
+        logger.info("before")
+        logger.info("broken %s", Unprintable())
+        logger.info("after")
+        writer.stop()
+        stats = logging_stats()
+
+    assert [json.loads(line)["msg"] for line in stream.getvalue().splitlines()] == ["before", "after"]
+    assert stats == {'log_dropped': 0, 'log_write_errors': 1}
+    assert "Logging error" in capsys.readouterr().err
+
+
+def test_memory_report_shows_dropped_records(server):
+    with isolated_logger():
+        logger.handlers[:] = [relay.NonBlockingQueueHandler(relay.queue.Queue(maxsize=1))]
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        for _ in range(3):
+            logger.info("flood")
+        report = server.memory_report()
+    assert report['log_dropped'] == 2
+
+
+def test_sampling_only_applies_to_marked_sites():
+    sampler = relay.SamplingFilter(interval=60)
+
+    def record(msg, **extra):
+        entry = logging.LogRecord("fitness_relay", logging.WARNING, __file__, 0, msg, (), None)
+        entry.__dict__.update(extra)
+        return entry
+
+    assert [sampler.filter(record("Disconnecting %s: rate limit exceeded")) for _ in range(3)] == [True] * 3
+    assert [sampler.filter(record("Malformed message: %s", sampled=True)) for _ in range(3)] == [True, False, False]
+    assert sampler.suppressed == {("Malformed message: %s", logging.WARNING): 2}
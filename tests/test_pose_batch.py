@@ -0,0 +1,41 @@
+import asyncio
+import json
+
+from conftest import FakeConnection, connect_device
+from visualizer_server_firebase import POSE_BATCH_HEADER, POSE_BATCH_KEYPOINT, POSE_BATCH_TIMESTAMP
+
+JSON_BATCH = json.dumps({
+    "type": "pose_batch",
+    "data": {"exerciseType": "squats", "frames": [{"timestamp": 1, "keypoints": []}, {"timestamp": 2, "keypoints": []}]}
+})
+BINARY_BATCH = POSE_BATCH_HEADER.pack(1, 3, 1, 1) + POSE_BATCH_TIMESTAMP.pack(5.0) + POSE_BATCH_KEYPOINT.pack(0.1, 0.2, 0.9)
+
+
+def feedback(websocket):
+    return [json.loads(message)["payload"] for message in websocket.sent if json.loads(message)["type"] == "ai_feedback"]
+
+
+def test_negotiated_batches_get_one_aggregated_feedback(server):
+    async def scenario():
+        websocket = await connect_device(server, capabilities=["pose_batch", "pose_batch_binary"])
+        await server.handle_message(websocket, JSON_BATCH)
+        await server.handle_message(websocket, BINARY_BATCH)
+        return feedback(websocket)
+
+    replies = asyncio.run(scenario())
+    assert [(reply["frames"], reply["ackTimestamp"]) for reply in replies] == [(2, 2), (1, 5.0)]
+
+
+def test_batches_without_negotiation_are_dropped(server):
+    async def scenario():
+        legacy = await connect_device(server)
+        await server.handle_message(legacy, JSON_BATCH)
+        await server.handle_message(legacy, BINARY_BATCH)
+
+        anonymous = FakeConnection()
+        await server.on_connect(anonymous)
+        await server.handle_message(anonymous, JSON_BATCH)
+        return feedback(legacy) + feedback(anonymous)
+
+    assert asyncio.run(scenario()) == []
+    assert server.admission_stats['unnegotiated'] == 3
@@ -0,0 +1,86 @@
+import asyncio
+import json
+
+from conftest import connect_device
+
+
+def commands(websocket):
+    return [
+        json.loads(message)["payload"] for message in websocket.sent
+        if json.loads(message)["type"] == "system_command"
+    ]
+
+
+def test_commands_issued_while_parked_are_replayed_on_resume(server):
+    async def scenario():
+        first = await connect_device(server)
+        await server.select_exercise(1, "squats")
+        await server.on_disconnect(first)
+
+        await server.select_exercise(1, "bicep-curls")
+        await server.start_workout(1)
+        assert server.device_workout_state["dev1"]["is_active"]
+
+        second = await connect_device(server)
+        return commands(second)
+
+    assert asyncio.run(scenario()) == [
+        {"action": "select_exercise", "exerciseType": "bicep-curls"},
+        {"action": "start_workout"}
+    ]
+
+
+def test_wrong_resume_token_cannot_take_over_a_session(server):
+    async def scenario():
+        owner = await connect_device(server, capabilities=[])
+        token = json.loads(owner.sent[0])["payload"]["resumeToken"]
+        await server.start_workout(1)
+
+        hijacker = await connect_device(server)
+        assert json.loads(hijacker.sent[-1])["type"] == "registration_rejected"
+        assert server.device_connections["dev1"] is owner
+        assert server.device_workout_state["dev1"]["is_active"]
+
+        # The owner resuming on a new socket detaches the old one
+        resumed = await connect_device(server, capabilities=[], resumeToken=token)
+        # The close runs in the background but stays referenced until it finishes
+        assert len(server._background_tasks) == 1
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)  # Done callbacks run one loop iteration after the task finishes
+        assert not server._background_tasks
+        assert server.device_connections["dev1"] is resumed
+        assert server.connections[owner] == "unknown"
+        assert owner.close_code == 4000
+        await server.handle_message(owner, json.dumps({"type": "biometric_data", "data": {"heartRate": 150}}))
+        assert server.device_biometrics.get("dev1") is None
+
+    asyncio.run(scenario())
+
+
+def test_registration_over_session_limit_is_rejected_and_closed(server):
+    server.MAX_SESSIONS = 1
+
+    async def scenario():
+        await connect_device(server, "dev1")
+        return await connect_device(server, "dev2")
+
+    refused = asyncio.run(scenario())
+    assert json.loads(refused.sent[-1]) == {
+        "type": "registration_rejected",
+        "payload": {"deviceId": "dev2", "reason": "session limit reached"}
+    }
+    assert refused.close_code == 1013
+    assert list(server.device_sessions) == ["dev1"]
+
+
+def test_owner_can_reregister_on_its_own_socket_without_token(server):
+    async def scenario():
+        websocket = await connect_device(server, capabilities=["pose_batch"])
+        await server.handle_message(websocket, json.dumps(
+            {"type": "device_register", "deviceId": "dev1", "capabilities": ["pose_batch"]}))
+        return websocket
+
+    websocket = asyncio.run(scenario())
+    assert [json.loads(message)["type"] for message in websocket.sent] == ["device_registered", "device_registered"]
+    assert server.device_connections["dev1"] is websocket
+    assert websocket.close_code is None
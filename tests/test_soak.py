@@ -0,0 +1,92 @@
+import asyncio
+import gc
+import json
+
+from conftest import FakeConnection
+from visualizer_server_firebase import POSE_BATCH_HEADER, POSE_BATCH_KEYPOINT, POSE_BATCH_TIMESTAMP, current_rss_bytes
+
+ROUNDS = 40
+DEVICES_PER_ROUND = 100
+MAX_SESSIONS = 150
+RSS_GROWTH_LIMIT = 4 * 1024 * 1024
+
+
+def device_messages(device_id):
+    keypoints = POSE_BATCH_KEYPOINT.pack(0.5, 0.5, 0.9) * 17
+    binary_batch = POSE_BATCH_HEADER.pack(1, 3, 4, 17) + b''.join(
+        POSE_BATCH_TIMESTAMP.pack(float(frame)) + keypoints for frame in range(4))
+    messages = [json.dumps({
+        "type": "device_register", "deviceId": device_id,
+        "capabilities": ["pose_batch", "pose_batch_binary"]
+    })]
+    messages += [json.dumps({
+        "type": "biometric_data", "deviceId": device_id,
+        "data": {"heartRate": 90 + sample, "repCount": sample}
+    }) for sample in range(8)]
+    messages.append(json.dumps({
+        "type": "pose_batch", "deviceId": device_id,
+        "data": {"exerciseType": "squats", "frames": [{"timestamp": frame, "keypoints": []} for frame in range(8)]}
+    }))
+    messages.append(binary_batch)
+    messages.append(json.dumps({"type": "rep_detection", "deviceId": device_id, "data": {"repCount": 9}}))
+    return messages
+
+
+async def run_device(server, device_id):
+    websocket = FakeConnection()
+    session = asyncio.create_task(server.handler(websocket, "/"))
+    websocket.feed(*device_messages(device_id))
+    # Registration reply plus one ai_feedback per batch
+    while len(websocket.sent) < 3:
+        await asyncio.sleep(0.01)
+    await server.send_performance_metrics(websocket, device_id)
+    websocket.feed(None)
+    await session
+
+
+async def churn(server):
+    dashboard = FakeConnection()
+    dashboard_session = asyncio.create_task(server.handler(dashboard, "/"))
+    dashboard.feed('{"type": "dashboard_subscribe"}')
+
+    rss = []
+    for round_number in range(ROUNDS):
+        await asyncio.gather(*(
+            run_device(server, f"soak-{round_number}-{device_number}")
+            for device_number in range(DEVICES_PER_ROUND)
+        ))
+        server.expire_sessions()
+        server.update_dashboard_state()
+        server.get_dashboard_snapshot_message()
+        gc.collect()
+        rss.append(current_rss_bytes())
+        assert len(server.device_sessions) <= MAX_SESSIONS
+
+    assert dashboard in server.dashboard_subscribers
+    await dashboard.close()
+    await dashboard_session
+    return rss
+
+
+def test_memory_stays_flat_under_device_churn(server):
+    server.SESSION_GRACE_PERIOD = 3600  # Only the LRU cap can bound sessions while churning
+    server.MAX_SESSIONS = MAX_SESSIONS
+
+    rss = asyncio.run(churn(server))
+
+    assert server.lru_evictions == ROUNDS * DEVICES_PER_ROUND - MAX_SESSIONS
+    assert server.admission_stats['throttled'] == 0
+    if rss[0] is not None:
+        # The session cap is reached in the second round; after that RSS must stay flat
+        settled = rss[len(rss) // 2:]
+        assert max(settled) - min(settled) < RSS_GROWTH_LIMIT, rss
+
+    # Past the TTL every parked session and all per-device state must be gone
+    server.SESSION_GRACE_PERIOD = -1
+    server.expire_sessions()
+    server.update_dashboard_state()
+    leftovers = {
+        name: entry['entries'] for name, entry in server.memory_report().items()
+        if isinstance(entry, dict) and entry['entries']
+    }
+    assert leftovers == {}
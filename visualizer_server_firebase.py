@@ -1,14 +1,423 @@
 import struct
 import asyncio
+import bisect
 import json
+import logging
+import logging.handlers
+import os
+import queue
 import random
+import re
+import secrets
 import time
 import socket
+import sys
+from http import HTTPStatus
+import threading
+import traceback
+from array import array
+from collections import OrderedDict, deque
 import websockets
 from websockets.server import WebSocketServerProtocol
 import firebase_admin
 from firebase_admin import credentials, db
 
+logger = logging.getLogger("fitness_relay")
+
+class StructuredFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, msg plus any `fields` passed via extra"""
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "msg": record.getMessage()
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if getattr(record, 'suppressed', 0):
+            entry["suppressed"] = record.suppressed
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    """Lets each template logged with extra={'sampled': True} through at most once per interval, counting the rest"""
+    def __init__(self, interval=10.0):
+        super().__init__()
+        self.interval = interval
+        self.last_emitted = {}  # (msg template, level) -> monotonic time
+        self.suppressed = {}  # (msg template, level) -> records dropped since last emit
+
+    def filter(self, record):
+        if not getattr(record, 'sampled', False):
+            return True
+        key = (record.msg, record.levelno)
+        now = time.monotonic()
+        if now - self.last_emitted.get(key, -self.interval) < self.interval:
+            self.suppressed[key] = self.suppressed.get(key, 0) + 1
+            return False
+        self.last_emitted[key] = now
+        record.suppressed = self.suppressed.pop(key, 0)
+        return True
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the writer thread unformatted and drops them if the queue is full"""
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Formatting happens on the writer thread, not the event loop
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class BatchLogWriter(threading.Thread):
+    """Background thread that drains queued records and writes them in batches"""
+    def __init__(self, log_queue, stream, formatter, batch_size=256):
+        super().__init__(name="log-writer", daemon=True)
+        self.queue = log_queue
+        self.stream = stream
+        self.formatter = formatter
+        self.batch_size = batch_size
+        self.errors = 0
+
+    def run(self):
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                running = False
+                batch = [record for record in batch if record is not None]
+            lines = []
+            for record in batch:
+                # One bad record must not cost the rest of the batch
+                try:
+                    lines.append(self.formatter.format(record) + '\n')
+                except Exception:
+                    self.handle_error(record)
+            try:
+                self.stream.write(''.join(lines))
+                self.stream.flush()
+            except Exception:
+                self.handle_error(batch[0] if batch else None)
+
+    def handle_error(self, record):
+        """Count the failure and report it on stderr, like logging.Handler.handleError"""
+        self.errors += 1
+        if not logging.raiseExceptions or sys.stderr is None:
+            return
+        try:
+            sys.stderr.write('--- Logging error ---\n')
+            traceback.print_exc(file=sys.stderr)
+            if record is not None:
+                sys.stderr.write('Message: %r\nArguments: %s\n' % (record.msg, record.args))
+        except OSError:
+            pass
+
+    def stop(self):
+        """Flush what is queued and stop the thread"""
+        self.queue.put(None)
+        self.join(timeout=5)
+
+def current_rss_bytes():
+    """Resident set size from /proc, or None where that isn't available (e.g. Windows)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def setup_logging(level="INFO", stream=None, queue_size=10000):
+    """Route the relay logger through a bounded queue to a batching writer thread"""
+    log_queue = queue.Queue(maxsize=queue_size)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(SamplingFilter())
+    logger.handlers[:] = [handler]
+    logger.setLevel(level.upper())
+    logger.propagate = False
+    
+    writer = BatchLogWriter(log_queue, stream or sys.stdout, StructuredFormatter())
+    handler.writer = writer
+    writer.start()
+    return writer
+
+def logging_stats():
+    """Records dropped on a full queue and records the writer failed to emit, for the memory report"""
+    stats = {'log_dropped': 0, 'log_write_errors': 0}
+    for handler in logger.handlers:
+        if isinstance(handler, NonBlockingQueueHandler):
+            stats['log_dropped'] += handler.dropped
+            writer = getattr(handler, 'writer', None)
+            if writer is not None:
+                stats['log_write_errors'] += writer.errors
+    return stats
+
+# Cheap sniff of the "type" field so over-budget messages can be dropped before json.loads.
+# Clients always send "type" first, so only the head of the frame is scanned.
+MESSAGE_TYPE_PATTERN = re.compile(r'"type"\s*:\s*"([A-Za-z_]{1,32})"')
+MESSAGE_TYPE_SCAN_BYTES = 96
+
+# Binary pose_batch frame layout (little-endian):
+#   header: kind (0x01), exercise index, frame count, keypoints per frame
+#   frame:  timestamp ms (double), then keypoints * (x, y, score) floats
+# JSON text always starts with '{' or whitespace, so the kind byte cannot collide with it.
+POSE_BATCH_KIND = 0x01
+POSE_BATCH_HEADER = struct.Struct('<BBHH')
+POSE_BATCH_TIMESTAMP = struct.Struct('<d')
+POSE_BATCH_KEYPOINT = struct.Struct('<fff')
+
+class TokenBucket:
+    """Token bucket limiter - refills `rate` tokens per second up to `capacity`"""
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def consume(self, now, tokens=1):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+class DownsampledTier:
+    """Fixed-size ring of heart rate buckets (mean/min/max) at one resolution"""
+    __slots__ = ('interval', 'capacity', 'starts', 'means', 'lows', 'highs', 'head', 'size',
+                 'bucket_start', 'total', 'count', 'low', 'high')
+
+    def __init__(self, interval, capacity):
+        self.interval = interval
+        self.capacity = capacity
+        self.starts = array('d', [0.0]) * capacity
+        self.means = array('f', [0.0]) * capacity
+        self.lows = array('f', [0.0]) * capacity
+        self.highs = array('f', [0.0]) * capacity
+        self.head = 0
+        self.size = 0
+        self.bucket_start = None
+        self.total = 0.0
+        self.count = 0
+        self.low = 0.0
+        self.high = 0.0
+
+    def add(self, now, value):
+        """Fold a sample into the open bucket; returns (start, total, count, low, high) if a bucket closed"""
+        closed = None
+        bucket_start = now - now % self.interval
+        if self.count and bucket_start != self.bucket_start:
+            closed = self.flush()
+        if not self.count:
+            self.bucket_start = bucket_start
+            self.low = self.high = value
+        self.total += value
+        self.count += 1
+        self.low = min(self.low, value)
+        self.high = max(self.high, value)
+        return closed
+
+    def flush(self):
+        closed = (self.bucket_start, self.total, self.count, self.low, self.high)
+        self.starts[self.head] = self.bucket_start
+        self.means[self.head] = self.total / self.count
+        self.lows[self.head] = self.low
+        self.highs[self.head] = self.high
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        self.total = 0.0
+        self.count = 0
+        return closed
+
+    def series(self):
+        """Closed buckets oldest first as (start, mean, low, high)"""
+        first = (self.head - self.size) % self.capacity
+        return [
+            (self.starts[i], self.means[i], self.lows[i], self.highs[i])
+            for i in ((first + n) % self.capacity for n in range(self.size))
+        ]
+
+class BiometricAggregator:
+    """Streaming per-device heart rate and rep statistics with bounded memory"""
+    RAW_CAPACITY = 256  # Most recent raw heart rate samples kept
+    TIERS = ((1, 300), (10, 360), (60, 240))  # (bucket seconds, buckets kept): 5 min, 1 h, 4 h
+    ROLLING_WINDOW = 60  # Seconds covered by rolling heart rate and reps-per-minute stats
+    HR_MAX = 190  # Reference max heart rate for zones (no age known)
+    HR_ZONES = (0.5, 0.6, 0.7, 0.8, 0.9)  # Zone 1-5 lower bounds as a fraction of HR_MAX
+    MAX_ZONE_GAP = 5  # Seconds; longer gaps between samples aren't credited to any zone
+
+    def __init__(self):
+        self.zone_floors = [self.HR_MAX * fraction for fraction in self.HR_ZONES]
+        self.reset()
+
+    def reset(self, now=None):
+        self.started = time.monotonic() if now is None else now
+        self.raw_times = array('d', [0.0]) * self.RAW_CAPACITY
+        self.raw_values = array('f', [0.0]) * self.RAW_CAPACITY
+        self.raw_head = 0
+        self.raw_size = 0
+        self.tiers = [DownsampledTier(interval, capacity) for interval, capacity in self.TIERS]
+        
+        # Whole-session running stats
+        self.heart_rate = 0
+        self.heart_rate_count = 0
+        self.heart_rate_total = 0.0
+        self.heart_rate_min = 0
+        self.heart_rate_max = 0
+        self.last_heart_rate_time = None
+        self.zone_seconds = [0.0] * (len(self.HR_ZONES) + 1)  # Index 0 is below zone 1
+        self.rep_count = 0
+        self.start_rep_count = None
+        
+        # Rolling window over closed 1 s buckets: sliding sum plus monotonic min/max queues
+        self.window = deque()  # (bucket_start, total, count)
+        self.window_total = 0.0
+        self.window_count = 0
+        self.window_lows = deque()  # (bucket_start, low), increasing lows
+        self.window_highs = deque()  # (bucket_start, high), decreasing highs
+        self.rep_window = deque(maxlen=self.RAW_CAPACITY)  # (time, rep_count)
+
+    def add_heart_rate(self, now, heart_rate):
+        if self.last_heart_rate_time is not None:
+            elapsed = now - self.last_heart_rate_time
+            if elapsed <= self.MAX_ZONE_GAP:
+                self.zone_seconds[bisect.bisect_right(self.zone_floors, self.heart_rate)] += elapsed
+        self.last_heart_rate_time = now
+        
+        self.heart_rate = heart_rate
+        self.heart_rate_total += heart_rate
+        self.heart_rate_count += 1
+        if self.heart_rate_count == 1:
+            self.heart_rate_min = self.heart_rate_max = heart_rate
+        else:
+            self.heart_rate_min = min(self.heart_rate_min, heart_rate)
+            self.heart_rate_max = max(self.heart_rate_max, heart_rate)
+        
+        self.raw_times[self.raw_head] = now
+        self.raw_values[self.raw_head] = heart_rate
+        self.raw_head = (self.raw_head + 1) % self.RAW_CAPACITY
+        self.raw_size = min(self.raw_size + 1, self.RAW_CAPACITY)
+        
+        closed = self.tiers[0].add(now, heart_rate)
+        for tier in self.tiers[1:]:
+            tier.add(now, heart_rate)
+        if closed:
+            self._slide_window(*closed)
+
+    def _slide_window(self, start, total, count, low, high):
+        self.window.append((start, total, count))
+        self.window_total += total
+        self.window_count += count
+        while self.window_lows and self.window_lows[-1][1] >= low:
+            self.window_lows.pop()
+        self.window_lows.append((start, low))
+        while self.window_highs and self.window_highs[-1][1] <= high:
+            self.window_highs.pop()
+        self.window_highs.append((start, high))
+        self._evict_window(start - self.ROLLING_WINDOW)
+
+    def _evict_window(self, horizon):
+        """Drop closed buckets and rep samples at or before `horizon`"""
+        while self.window and self.window[0][0] <= horizon:
+            _, old_total, old_count = self.window.popleft()
+            self.window_total -= old_total
+            self.window_count -= old_count
+        while self.window_lows and self.window_lows[0][0] <= horizon:
+            self.window_lows.popleft()
+        while self.window_highs and self.window_highs[0][0] <= horizon:
+            self.window_highs.popleft()
+        while self.rep_window and self.rep_window[0][0] <= horizon:
+            self.rep_window.popleft()
+
+    def add_reps(self, now, rep_count):
+        # Counts only go up within a workout; a lower value is a stale or defaulted report
+        if rep_count < self.rep_count:
+            return
+        if self.start_rep_count is None:
+            self.start_rep_count = rep_count
+        self.rep_count = rep_count
+        self.rep_window.append((now, rep_count))
+        while now - self.rep_window[0][0] > self.ROLLING_WINDOW:
+            self.rep_window.popleft()
+
+    def memory_bytes(self):
+        """Approximate bytes held - bounded by RAW_CAPACITY, TIERS and ROLLING_WINDOW, not session length"""
+        arrays = [self.raw_times, self.raw_values]
+        for tier in self.tiers:
+            arrays += [tier.starts, tier.means, tier.lows, tier.highs]
+        queues = (self.window, self.window_lows, self.window_highs, self.rep_window)
+        return sum(len(values) * values.itemsize for values in arrays) + sum(sys.getsizeof(q) for q in queues)
+
+    def rolling_heart_rate(self, now):
+        """(avg, min, max) over the last ROLLING_WINDOW seconds, including the open 1 s bucket"""
+        total, count = self.window_total, self.window_count
+        lows = [self.window_lows[0][1]] if self.window_lows else []
+        highs = [self.window_highs[0][1]] if self.window_highs else []
+        current = self.tiers[0]
+        if current.count and current.bucket_start > now - self.ROLLING_WINDOW:
+            total += current.total
+            count += current.count
+            lows.append(current.low)
+            highs.append(current.high)
+        if not count:
+            return 0, 0, 0
+        return round(total / count, 1), min(lows), max(highs)
+
+    def history(self, resolution):
+        """Stored samples for one resolution: 'raw' as (time, bpm), or a tier interval as (start, mean, low, high)"""
+        if resolution == "raw":
+            first = (self.raw_head - self.raw_size) % self.RAW_CAPACITY
+            return [
+                (self.raw_times[i], self.raw_values[i])
+                for i in ((first + n) % self.RAW_CAPACITY for n in range(self.raw_size))
+            ]
+        for tier in self.tiers:
+            if tier.interval == resolution:
+                return tier.series()
+        return None
+
+    def current_heart_rate(self, now=None):
+        """Latest device heart rate, or 0 once no sample has arrived for ROLLING_WINDOW seconds"""
+        now = time.monotonic() if now is None else now
+        if self.last_heart_rate_time is None or now - self.last_heart_rate_time > self.ROLLING_WINDOW:
+            return 0
+        return self.heart_rate
+
+    def summary(self, now=None):
+        """Precomputed session stats - O(1) amortized, nothing is rescanned"""
+        now = time.monotonic() if now is None else now
+        # A quiet device must not keep reporting its last window
+        self._evict_window(now - self.ROLLING_WINDOW)
+        rolling_avg, rolling_min, rolling_max = self.rolling_heart_rate(now)
+        elapsed_minutes = max(now - self.started, 1) / 60.0
+        session_reps = self.rep_count - (self.start_rep_count or 0)
+        window_reps = self.rep_count - self.rep_window[0][1] if self.rep_window else 0
+        window_seconds = max(now - self.rep_window[0][0], 1) if self.rep_window else self.ROLLING_WINDOW
+        return {
+            "heartRate": self.current_heart_rate(now),
+            "heartRateAvg": round(self.heart_rate_total / self.heart_rate_count, 1) if self.heart_rate_count else 0,
+            "heartRateMin": self.heart_rate_min,
+            "heartRateMax": self.heart_rate_max,
+            "rollingHeartRateAvg": rolling_avg,
+            "rollingHeartRateMin": rolling_min,
+            "rollingHeartRateMax": rolling_max,
+            "hrZoneSeconds": [int(seconds) for seconds in self.zone_seconds],
+            "repCount": self.rep_count,
+            "repsPerMinute": round(session_reps / elapsed_minutes, 1),
+            "rollingRepsPerMinute": round(window_reps * 60.0 / window_seconds, 1)
+        }
+
 class FitnessRelayServer:
     # Firebase Configuration
     FIREBASE_CONFIG = {
@@ -22,6 +431,39 @@ class FitnessRelayServer:
         'measurementId': "G-Y6VNEXZ2DB"
     }
     
+    # Admission control
+    MAX_CONNECTIONS = 200  # Concurrent websocket connections
+    MAX_MESSAGE_SIZE = 64 * 1024  # Frames above this are rejected by websockets before buffering
+    REGISTRATION_TIMEOUT = 5  # Seconds a connection may stay silent before it must register or subscribe
+    DEVICE_RATE_LIMIT = (60, 120)  # (messages/sec, burst) across all message types
+    MESSAGE_RATE_LIMITS = {  # message_type -> (messages/sec, burst)
+        'device_register': (0.2, 3),
+        'biometric_data': (5, 10),
+        'pose_data': (30, 60),
+        'rep_detection': (5, 10),
+        'pose_batch': (5, 10),
+        'dashboard_subscribe': (0.2, 3),
+        'dashboard_history': (1, 5)
+    }
+    VIOLATION_LIMIT = (1, 50)  # (forgiven drops/sec, burst) before the client is disconnected
+    
+    # Capabilities a client may advertise in device_register
+    SUPPORTED_CAPABILITIES = ('pose_batch', 'pose_batch_binary')
+    MAX_BATCH_FRAMES = 32  # Frames beyond this in a single pose_batch are ignored
+    POSE_BATCH_EXERCISES = ["push-ups", "bicep-curls", "lateral-raises", "squats"]  # Binary exercise index
+    
+    # Session resumption
+    SESSION_GRACE_PERIOD = 60  # Seconds a disconnected device keeps its index and workout state
+    ACCEPT_RATE_LIMIT = (20, 20)  # (new connections/sec, burst) - paces reconnect storms
+    
+    # Session lifecycle - per-session state is fixed-size, so capping sessions caps memory
+    MAX_SESSIONS = 500  # Live + parked sessions; least recently used parked ones are evicted beyond this
+    MEMORY_REPORT_INTERVAL = 300  # Seconds between memory reports
+    
+    # Coach/dashboard fan-out
+    DASHBOARD_INTERVAL = 1.0  # Seconds between dashboard updates
+    DASHBOARD_FULL_SNAPSHOT_EVERY = 10  # Updates between full snapshots; deltas in between
+    
     def __init__(self):
         self.connections = {}  # hdl -> device_id
         self.device_connections = {}  # device_id -> hdl
@@ -31,6 +473,37 @@ class FitnessRelayServer:
         
         # Track workout state for dynamic metrics
         self.device_workout_state = {}  # device_id -> {start_time, rep_count, is_active, base_heart_rate}
+        self.device_capabilities = {}  # device_id -> set of negotiated capabilities
+        self.device_sessions = OrderedDict()  # device_id -> {index, resume_token, disconnected_at, exercise, workout_command, feedback}, LRU first
+        self.lru_evictions = 0
+        self.device_biometrics = {}  # device_id -> BiometricAggregator
+        
+        # Read-only dashboard subscribers share one snapshot per interval
+        self.dashboard_subscribers = set()  # hdl
+        self._dashboard_state = {}  # device_id -> entry as last published
+        self._dashboard_seq = 0  # Bumped whenever the published state changes
+        self._dashboard_full_message = None  # Encoded snapshot of _dashboard_state, built on demand
+        self._dashboard_updates = 0  # Intervals published, every DASHBOARD_FULL_SNAPSHOT_EVERY-th is a full snapshot
+        self._last_feedback_time = {}  # device_id -> last AI feedback send time
+        self._next_accept_slot = 0.0  # Earliest monotonic time the next connection may be upgraded
+        self._pending_accepts = 0  # Upgrades waiting in pace_accept, counted against MAX_CONNECTIONS
+        self._background_tasks = set()  # Strong references so asyncio can't collect running tasks
+        
+        # Per-connection rate limiters and admission counters
+        self.connection_limits = {}  # hdl -> {device, violations, types: {message_type -> TokenBucket}}
+        self.device_limits = {}  # device_id -> same limits dict, kept until the session expires
+        self._unregistered = {}  # hdl -> monotonic connect time, until it registers or subscribes
+        self.admission_stats = {
+            'accepted': 0,
+            'throttled': 0,
+            'unknown_type': 0,
+            'type_mismatch': 0,
+            'unnegotiated': 0,
+            'malformed': 0,
+            'rejected_connections': 0,
+            'registration_timeouts': 0,
+            'disconnected_clients': 0
+        }
         
         # Firebase Realtime Database state
         self.firebase_app = None
@@ -214,31 +687,213 @@ class FitnessRelayServer:
             
             return self.firebase_data
         except Exception as e:
-            print(f"Error fetching Firebase data: {e}")
+            logger.warning("Error fetching Firebase data: %s", e, extra={'sampled': True})
             return self.firebase_data
 
+    def spawn(self, coroutine):
+        """Run a coroutine as a background task, keeping a reference until it finishes"""
+        task = asyncio.create_task(coroutine)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
     async def on_connect(self, websocket: WebSocketServerProtocol):
-        print("New client connected")
+        logger.info("New client connected")
         self.connections[websocket] = "unknown"
+        self._unregistered[websocket] = time.monotonic()
+        self.connection_limits[websocket] = {
+            'device': TokenBucket(*self.DEVICE_RATE_LIMIT),
+            'violations': TokenBucket(*self.VIOLATION_LIMIT),
+            'types': {
+                message_type: TokenBucket(*limit)
+                for message_type, limit in self.MESSAGE_RATE_LIMITS.items()
+            }
+        }
+
+    def bind_device_limits(self, websocket, device_id):
+        """Charge a registered connection to its device's buckets, so reconnecting doesn't refill them"""
+        limits = self.device_limits.get(device_id)
+        if limits is not None:
+            self.connection_limits[websocket] = limits
+        elif websocket in self.connection_limits:
+            self.device_limits[device_id] = self.connection_limits[websocket]
 
     async def on_disconnect(self, websocket: WebSocketServerProtocol):
-        print("Client disconnected")
-        device_id = self.connections.pop(websocket, "unknown")
-        if device_id != "unknown":
-            self.device_connections.pop(device_id, None)
-            # Remove from index
-            for idx, dev_id in list(self.device_index.items()):
-                if dev_id == device_id:
-                    del self.device_index[idx]
-                    break
-            print(f"Device {device_id} disconnected")
+        logger.info("Client disconnected")
+        self.connection_limits.pop(websocket, None)
+        self._unregistered.pop(websocket, None)
+        self.dashboard_subscribers.discard(websocket)
+        self.park_session(websocket, self.connections.pop(websocket, "unknown"))
+
+    def park_session(self, websocket, device_id):
+        """Detach a device from its socket, keeping its session for the grace period"""
+        # A resumed session may already own a newer socket for this device
+        if device_id != "unknown" and self.device_connections.get(device_id) is websocket:
+            del self.device_connections[device_id]
+            # Keep index and workout state for the grace period so the device can resume
+            session = self.device_sessions.get(device_id)
+            if session:
+                session['disconnected_at'] = time.monotonic()
+                self.device_sessions.move_to_end(device_id)
+            logger.info("Device %s disconnected (session held for %ss)", device_id, self.SESSION_GRACE_PERIOD,
+                        extra={'fields': {'device': device_id}})
+
+    def close_unregistered(self, now=None):
+        """Close connections that neither registered nor subscribed within REGISTRATION_TIMEOUT"""
+        now = time.monotonic() if now is None else now
+        # Silent sockets would otherwise hold MAX_CONNECTIONS slots and lock every device out
+        for websocket, connected_at in list(self._unregistered.items()):
+            if now - connected_at > self.REGISTRATION_TIMEOUT:
+                del self._unregistered[websocket]
+                self.admission_stats['registration_timeouts'] += 1
+                self.spawn(websocket.close(code=1008, reason="Registration timeout"))
+
+    def expire_sessions(self):
+        """Drop sessions that stayed disconnected longer than the grace period"""
+        now = time.monotonic()
+        for device_id, session in list(self.device_sessions.items()):
+            disconnected_at = session['disconnected_at']
+            if disconnected_at is not None and now - disconnected_at > self.SESSION_GRACE_PERIOD:
+                self.expire_session(device_id)
 
-    async def handle_message(self, websocket: WebSocketServerProtocol, message: str):
+    def expire_session(self, device_id):
+        """Forget a device session along with all per-device state"""
+        session = self.device_sessions.pop(device_id, None)
+        if session is None:
+            return
+        if self.device_index.get(session['index']) == device_id:
+            del self.device_index[session['index']]
+        self.device_workout_state.pop(device_id, None)
+        self.device_capabilities.pop(device_id, None)
+        self.device_biometrics.pop(device_id, None)
+        self.device_limits.pop(device_id, None)
+        self._last_feedback_time.pop(device_id, None)
+        logger.info("Session expired: %s [Index: %s]", device_id, session['index'],
+                    extra={'fields': {'device': device_id}})
+
+    def evict_lru_session(self):
+        """Expire the least recently used parked session; connected sessions are never evicted"""
+        for device_id, session in self.device_sessions.items():
+            if session['disconnected_at'] is not None:
+                break
+        else:
+            return False
+        self.lru_evictions += 1
+        self.expire_session(device_id)
+        return True
+
+    def memory_report(self):
+        """Entry counts and approximate bytes for every per-device structure, plus process RSS"""
+        structures = {
+            'connections': self.connections,
+            'device_connections': self.device_connections,
+            'device_index': self.device_index,
+            'device_sessions': self.device_sessions,
+            'device_workout_state': self.device_workout_state,
+            'device_capabilities': self.device_capabilities,
+            'device_biometrics': self.device_biometrics,
+            'connection_limits': self.connection_limits,
+            'unregistered_connections': self._unregistered,
+            'device_limits': self.device_limits,
+            'last_feedback_time': self._last_feedback_time,
+            'dashboard_subscribers': self.dashboard_subscribers,
+            'dashboard_state': self._dashboard_state
+        }
+        report = {}
+        for name, structure in structures.items():
+            size = sys.getsizeof(structure)
+            if structure is self.device_biometrics:
+                size += sum(biometrics.memory_bytes() for biometrics in structure.values())
+            elif isinstance(structure, dict):
+                size += sum(sys.getsizeof(value) for value in structure.values())
+            report[name] = {'entries': len(structure), 'bytes': size}
+        report['lru_evictions'] = self.lru_evictions
+        report['rss_bytes'] = current_rss_bytes()
+        report.update(logging_stats())
+        return report
+
+    async def manage_sessions(self):
+        """Expire idle sessions and silent connections every second and log a memory report every MEMORY_REPORT_INTERVAL"""
+        last_report = time.monotonic()
+        while True:
+            await asyncio.sleep(1)
+            self.expire_sessions()
+            self.close_unregistered()
+            if time.monotonic() - last_report >= self.MEMORY_REPORT_INTERVAL:
+                last_report = time.monotonic()
+                logger.info("Memory report", extra={'fields': self.memory_report()})
+
+    async def process_request(self, path, request_headers):
+        """Runs before the WebSocket upgrade: reject with 503 when full, otherwise wait for an upgrade slot"""
+        if len(self.connections) + self._pending_accepts >= self.MAX_CONNECTIONS:
+            self.admission_stats['rejected_connections'] += 1
+            return HTTPStatus.SERVICE_UNAVAILABLE, [("Retry-After", "5")], b"Server at capacity\n"
+        self._pending_accepts += 1
+        try:
+            await self.pace_accept()
+        finally:
+            self._pending_accepts -= 1
+        return None
+
+    async def pace_accept(self):
+        """Hand out upgrade slots at ACCEPT_RATE_LIMIT, with jitter.
+
+        TCP and TLS handshakes have already happened by the time this runs; what a reconnect
+        storm gets spread out is the upgrade, registration and session restore work after them.
+        """
+        rate, burst = self.ACCEPT_RATE_LIMIT
+        now = time.monotonic()
+        slot = max(now - burst / rate, self._next_accept_slot)
+        self._next_accept_slot = slot + 1 / rate
+        if slot > now:
+            await asyncio.sleep(slot - now + random.uniform(0, 1 / rate))
+
+    def admit_message(self, websocket, message):
+        """Decide whether a raw message may be decoded: returns ('accept' | 'drop' | 'disconnect', sniffed type)"""
+        limits = self.connection_limits.get(websocket)
+        if limits is None:
+            return 'accept', None
+        
+        head = message[:MESSAGE_TYPE_SCAN_BYTES]
+        if isinstance(head, bytes):
+            if head[:1] == bytes((POSE_BATCH_KIND,)):
+                head = '"type": "pose_batch"'
+            else:
+                head = head.decode('utf-8', 'ignore')
+        match = MESSAGE_TYPE_PATTERN.search(head)
+        message_type = match.group(1) if match else None
+        
+        now = time.monotonic()
+        bucket = limits['types'].get(message_type)
+        if bucket is None:
+            # Unknown or unparseable type - never worth a full decode
+            self.admission_stats['unknown_type'] += 1
+        elif limits['device'].consume(now) and bucket.consume(now):
+            self.admission_stats['accepted'] += 1
+            return 'accept', message_type
+        else:
+            self.admission_stats['throttled'] += 1
+        
+        if not limits['violations'].consume(now):
+            self.admission_stats['disconnected_clients'] += 1
+            return 'disconnect', message_type
+        return 'drop', message_type
+
+    async def handle_message(self, websocket: WebSocketServerProtocol, message: str, expected_type=None):
         try:
+            if isinstance(message, bytes) and message[:1] == bytes((POSE_BATCH_KIND,)):
+                if self.check_capability(websocket, "pose_batch_binary"):
+                    await self.handle_pose_batch(websocket, self.decode_binary_pose_batch(message))
+                return
+            
             data = json.loads(message)
             message_type = data.get("type", "")
+            if expected_type is not None and message_type != expected_type:
+                # Rate limits were charged to the sniffed type, so a different decoded type is a spoof
+                self.admission_stats['type_mismatch'] += 1
+                logger.warning("Message type %s does not match sniffed type %s", message_type, expected_type, extra={'sampled': True})
+                return
             device_id = data.get("deviceId", "")
-            #print(f"Received {message_type} from device {device_id}")
 
             if message_type == "device_register":
                 await self.handle_device_registration(websocket, data)
@@ -248,27 +903,147 @@ class FitnessRelayServer:
                 await self.handle_pose_data(websocket, data)
             elif message_type == "rep_detection":
                 await self.handle_rep_detection(websocket, data)
+            elif message_type == "pose_batch":
+                if self.check_capability(websocket, "pose_batch"):
+                    await self.handle_pose_batch(websocket, data.get("data", {}))
+            elif message_type == "dashboard_subscribe":
+                await self.handle_dashboard_subscribe(websocket)
+            elif message_type == "dashboard_history":
+                await self.handle_dashboard_history(websocket, data)
             else:
-                print(f"Unknown message type: {message_type}")
+                logger.warning("Unknown message type: %s", message_type, extra={'sampled': True})
+        except json.JSONDecodeError as e:
+            self.admission_stats['malformed'] += 1
+            logger.warning("Malformed message: %s", e, extra={'sampled': True, 'fields': {'total': self.admission_stats['malformed']}})
         except Exception as e:
-            print(f"Error processing message: {e}")
+            logger.error("Error processing message: %s", e, extra={'sampled': True})
+
+    def check_capability(self, websocket, capability):
+        """True if the device on this connection negotiated `capability` in device_register"""
+        device_id = self.connections.get(websocket, "unknown")
+        if capability in self.device_capabilities.get(device_id, ()):
+            return True
+        self.admission_stats['unnegotiated'] += 1
+        logger.warning("Dropping %s from %s: capability not negotiated", capability, device_id, extra={'sampled': True})
+        return False
 
     async def handle_device_registration(self, websocket, data):
         device_id = data.get("deviceId", "")
         exercise_type = data.get("exerciseType", "")
         if device_id:
+            # Sessions issued a token only resume with it; legacy clients resume by device id
+            session = self.device_sessions.get(device_id)
+            # Re-registering on the socket that already owns the session needs no token
+            owns_session = self.device_connections.get(device_id) is websocket
+            if (session is not None and not owns_session
+                    and session['resume_token'] not in (None, data.get("resumeToken"))):
+                logger.warning("Rejecting registration for %s: resume token mismatch", device_id)
+                await websocket.send(json.dumps({
+                    "type": "registration_rejected",
+                    "payload": {"deviceId": device_id, "reason": "invalid resume token"}
+                }))
+                return
+            resumed = session is not None
+            
+            if resumed:
+                session['disconnected_at'] = None
+                self.device_sessions.move_to_end(device_id)
+            else:
+                if len(self.device_sessions) >= self.MAX_SESSIONS and not self.evict_lru_session():
+                    logger.warning("Session limit reached, rejecting registration from %s", device_id)
+                    await websocket.send(json.dumps({
+                        "type": "registration_rejected",
+                        "payload": {"deviceId": device_id, "reason": "session limit reached"}
+                    }))
+                    # An unregistered socket would otherwise hold a connection slot indefinitely
+                    await websocket.close(code=1013, reason="Session limit reached")
+                    return
+                # Assign index to device
+                self.device_counter += 1
+                self.device_index[self.device_counter] = device_id
+                session = {
+                    'index': self.device_counter,
+                    'resume_token': None,
+                    'disconnected_at': None,
+                    'exercise': None,
+                    'workout_command': None,
+                    'feedback': None
+                }
+                self.device_sessions[device_id] = session
+            
+            # Re-registering a socket under a new id must not strand the old device's session
+            previous_id = self.connections.get(websocket, "unknown")
+            if previous_id != device_id:
+                self.park_session(websocket, previous_id)
+            # A socket taking over the session detaches the old one so it can't write into it
+            previous_socket = self.device_connections.get(device_id)
+            if previous_socket is not None and previous_socket is not websocket:
+                self.connections[previous_socket] = "unknown"
+                self.spawn(previous_socket.close(code=4000, reason="Session resumed elsewhere"))
             self.connections[websocket] = device_id
             self.device_connections[device_id] = websocket
-            # Assign index to device
-            self.device_counter += 1
-            self.device_index[self.device_counter] = device_id
-            print(f"Device registered: {device_id} (Exercise: {exercise_type}) [Index: {self.device_counter}]")
+            self._unregistered.pop(websocket, None)
+            self.bind_device_limits(websocket, device_id)
+            if resumed:
+                logger.info("Device resumed: %s [Index: %s]", device_id, session['index'],
+                            extra={'fields': {'device': device_id}})
+            else:
+                logger.info("Device registered: %s (Exercise: %s) [Index: %s]", device_id, exercise_type,
+                            session['index'], extra={'fields': {'device': device_id}})
+            
+            # Old clients send no capabilities and get no reply, so nothing changes for them
+            requested = data.get("capabilities")
+            if isinstance(requested, list):
+                capabilities = {cap for cap in requested if cap in self.SUPPORTED_CAPABILITIES}
+                self.device_capabilities[device_id] = capabilities
+                session['resume_token'] = secrets.token_urlsafe(16)
+                response = {
+                    "type": "device_registered",
+                    "payload": {
+                        "deviceId": device_id,
+                        "capabilities": sorted(capabilities),
+                        "maxBatchFrames": self.MAX_BATCH_FRAMES,
+                        "batchExercises": self.POSE_BATCH_EXERCISES,
+                        "resumeToken": session['resume_token'],
+                        "resumed": resumed,
+                        "sessionGracePeriod": self.SESSION_GRACE_PERIOD
+                    }
+                }
+                await websocket.send(json.dumps(response))
+            
+            if resumed:
+                await self.restore_session(websocket, device_id, session)
+
+    async def restore_session(self, websocket, device_id, session):
+        """Replay the latest exercise and workout command to a resumed device, including any issued while parked"""
+        if session['exercise']:
+            await self.send_system_command(websocket, "select_exercise", exerciseType=session['exercise'])
+        if session['workout_command']:
+            await self.send_system_command(websocket, session['workout_command'])
 
     async def handle_biometric_data(self, websocket, data):
         biometric_data = data.get("data", {})
         heart_rate = biometric_data.get("heartRate", 0)
         rep_count = biometric_data.get("repCount", 0)
         exercise_type = biometric_data.get("exerciseType", "")
+        
+        biometrics = self.get_biometrics(websocket)
+        if biometrics is None:
+            return
+        now = time.monotonic()
+        if heart_rate > 0:
+            biometrics.add_heart_rate(now, heart_rate)
+        if "repCount" in biometric_data:
+            biometrics.add_reps(now, rep_count)
+
+    def get_biometrics(self, websocket):
+        """Aggregator for the device registered on this connection, or None before registration"""
+        device_id = self.connections.get(websocket, "unknown")
+        if device_id == "unknown":
+            return None
+        if device_id not in self.device_biometrics:
+            self.device_biometrics[device_id] = BiometricAggregator()
+        return self.device_biometrics[device_id]
 
     async def handle_pose_data(self, websocket, data):
         pose_data = data.get("data", {})
@@ -276,13 +1051,83 @@ class FitnessRelayServer:
         await asyncio.sleep(0.05)
         await self.generate_and_send_feedback(websocket, exercise_type)
 
+    def decode_binary_pose_batch(self, message):
+        """Unpack a binary pose_batch frame into the same shape as the JSON `data` payload"""
+        _, exercise_index, frame_count, keypoint_count = POSE_BATCH_HEADER.unpack_from(message, 0)
+        frame_size = POSE_BATCH_TIMESTAMP.size + keypoint_count * POSE_BATCH_KEYPOINT.size
+        if len(message) != POSE_BATCH_HEADER.size + frame_count * frame_size:
+            raise ValueError(f"pose_batch size mismatch: {frame_count} frames x {keypoint_count} keypoints")
+        
+        frames = []
+        offset = POSE_BATCH_HEADER.size
+        for _ in range(min(frame_count, self.MAX_BATCH_FRAMES)):
+            (timestamp,) = POSE_BATCH_TIMESTAMP.unpack_from(message, offset)
+            keypoints = [
+                {"x": x, "y": y, "score": score}
+                for x, y, score in POSE_BATCH_KEYPOINT.iter_unpack(
+                    message[offset + POSE_BATCH_TIMESTAMP.size:offset + frame_size])
+            ]
+            frames.append({"timestamp": timestamp, "keypoints": keypoints})
+            offset += frame_size
+        
+        exercise_type = ""
+        if exercise_index < len(self.POSE_BATCH_EXERCISES):
+            exercise_type = self.POSE_BATCH_EXERCISES[exercise_index]
+        return {"exerciseType": exercise_type, "frames": frames}
+
+    async def handle_pose_batch(self, websocket, batch_data):
+        """Analyse K pose frames from one message and reply with a single aggregated feedback"""
+        frames = batch_data.get("frames", [])[:self.MAX_BATCH_FRAMES]
+        if not frames:
+            return
+        exercise_type = batch_data.get("exerciseType", "")
+        
+        # One simulated analysis pass for the whole batch instead of one per frame
+        await asyncio.sleep(0.05)
+        results = [self.analyze_pose_frame(exercise_type) for _ in frames]
+        
+        # Report the worst status seen in the batch, with its most frequent message
+        severity = {"good": 0, "warning": 1, "error": 2}
+        worst_status = max((status for status, _, _ in results), key=severity.get)
+        messages = [feedback for status, feedback, _ in results if status == worst_status]
+        feedback = max(set(messages), key=messages.count)
+        confidence = sum(conf for _, _, conf in results) / len(results)
+        self.record_feedback(websocket, feedback, worst_status)
+        
+        response = {
+            "type": "ai_feedback",
+            "payload": {
+                "timestamp": int(time.time() * 1000),
+                "feedback": feedback,
+                "status": worst_status,
+                "confidence": round(confidence, 3),
+                "frames": len(frames),
+                "ackTimestamp": frames[-1].get("timestamp")
+            }
+        }
+        await websocket.send(json.dumps(response))
+
     async def handle_rep_detection(self, websocket, data):
         rep_data = data.get("data", {})
         rep_count = rep_data.get("repCount", 0)
         exercise_type = rep_data.get("exerciseType", "")
-        print(f"Rep detected: {rep_count} for {exercise_type}")
+        logger.debug("Rep detected: %s for %s", rep_count, exercise_type)
+        biometrics = self.get_biometrics(websocket)
+        if biometrics is not None and "repCount" in rep_data:
+            biometrics.add_reps(time.monotonic(), rep_count)
 
     async def generate_and_send_feedback(self, websocket, exercise_type):
+        status, feedback_msg, confidence = self.analyze_pose_frame(exercise_type)
+        self.record_feedback(websocket, feedback_msg, status)
+
+    def record_feedback(self, websocket, feedback, status):
+        """Remember the latest feedback for the device's session (shown on dashboards)"""
+        session = self.device_sessions.get(self.connections.get(websocket))
+        if session:
+            session['feedback'] = {"message": feedback, "status": status}
+
+    def analyze_pose_frame(self, exercise_type):
+        """Produce (status, feedback, confidence) for a single pose frame"""
         feedback_index = random.randint(0, 6)
         confidence = random.uniform(0.7, 1.0)
         status = "good"
@@ -301,6 +1146,7 @@ class FitnessRelayServer:
         # Use modulo to safely access the template
         safe_index = feedback_index % len(templates)
         feedback_msg = templates[safe_index]
+        return status, feedback_msg, confidence
 
     async def send_ai_feedback(self,  exercise_type, status, feedback, confidence=0.85):
         device_id = self.resolve_device_id(1)
@@ -319,7 +1165,7 @@ class FitnessRelayServer:
                     }
                     await websocket.send(json.dumps(response))
                 except Exception as e:
-                    print(f"Error sending AI feedback: {e}")
+                    logger.warning("Error sending AI feedback: %s", e, extra={'sampled': True})
 
     # ============================================================================
     # WORKOUT CONTROL COMMANDS - For testing and control
@@ -336,9 +1182,9 @@ class FitnessRelayServer:
                 }
             }
             await websocket.send(json.dumps(command))
-            print(f"✓ Sent command: {action} {kwargs}")
+            logger.debug("Sent command: %s %s", action, kwargs)
         except Exception as e:
-            print(f"Error sending system command: {e}")
+            logger.warning("Error sending system command %s: %s", action, e, extra={'sampled': True})
     
     def resolve_device_id(self, identifier):
         """Resolve device identifier (can be index, device_id, or 'all')"""
@@ -351,95 +1197,83 @@ class FitnessRelayServer:
             if index in self.device_index:
                 return self.device_index[index]
             else:
-                print(f"❌ Device index {index} not found. Use 'list' to see devices.")
+                logger.warning("Device index %s not found. Use 'list' to see devices.", index)
                 return None
         except ValueError:
             # Not a number, treat as device_id
-            if identifier in self.device_connections:
+            if identifier in self.device_connections or identifier in self.device_sessions:
                 return identifier
             else:
-                print(f"❌ Device {identifier} not found. Use 'list' to see devices.")
+                logger.warning("Device %s not found. Use 'list' to see devices.", identifier)
                 return None
     
-    async def select_exercise(self, device_identifier, exercise_type):
-        """Select an exercise for a device or all devices"""
+    def command_targets(self, device_identifier):
+        """Device ids a command applies to - parked sessions included, so they can replay it on resume"""
         device_id = self.resolve_device_id(device_identifier)
         if device_id is None:
-            return
-            
+            return []
         if device_id == "all":
-            for dev_id, websocket in list(self.device_connections.items()):
-                if websocket.open:
-                    await self.send_system_command(websocket, "select_exercise", exerciseType=exercise_type)
-            print(f"📋 Sent to ALL: Select exercise '{exercise_type}'")
-        else:
-            websocket = self.device_connections.get(device_id)
-            if websocket and websocket.open:
-                await self.send_system_command(websocket, "select_exercise", exerciseType=exercise_type)
-                print(f"📋 Sent to device: Select exercise '{exercise_type}'")
-            else:
-                print(f"❌ Device not found or not connected")
+            return list(self.device_sessions)
+        return [device_id]
+    
+    async def deliver_command(self, device_id, action, **kwargs):
+        """Send a command if the device is connected; returns False if it is parked"""
+        websocket = self.device_connections.get(device_id)
+        if websocket and websocket.open:
+            await self.send_system_command(websocket, action, **kwargs)
+            return True
+        return False
+    
+    async def select_exercise(self, device_identifier, exercise_type):
+        """Select an exercise for a device or all devices"""
+        for device_id in self.command_targets(device_identifier):
+            if device_id in self.device_sessions:
+                self.device_sessions[device_id]['exercise'] = exercise_type
+            sent = await self.deliver_command(device_id, "select_exercise", exerciseType=exercise_type)
+            logger.info("%s: Select exercise '%s'", "Sent to device" if sent else "Queued for resume",
+                        exercise_type, extra={'fields': {'device': device_id}})
     
     async def start_workout(self, device_identifier):
         """Start workout for a device or all devices"""
-        device_id = self.resolve_device_id(device_identifier)
-        if device_id is None:
-            return
-            
-        if device_id == "all":
-            for dev_id, websocket in list(self.device_connections.items()):
-                if websocket.open:
-                    await self.send_system_command(websocket, "start_workout")
-                    # Activate workout state for dynamic metrics
-                    if dev_id in self.device_workout_state:
-                        self.device_workout_state[dev_id]['is_active'] = True
-                        self.device_workout_state[dev_id]['start_time'] = time.time()
-                        self.device_workout_state[dev_id]['rep_count'] = 0
-            print(f"▶️  Sent to ALL: Start workout (metrics now active)")
-        else:
-            websocket = self.device_connections.get(device_id)
-            if websocket and websocket.open:
-                await self.send_system_command(websocket, "start_workout")
-                # Activate workout state for dynamic metrics
-                if device_id in self.device_workout_state:
-                    self.device_workout_state[device_id]['is_active'] = True
-                    self.device_workout_state[device_id]['start_time'] = time.time()
-                    self.device_workout_state[device_id]['rep_count'] = 0
-                print(f"▶️  Sent to device: Start workout (metrics now active)")
-            else:
-                print(f"❌ Device not found or not connected")
+        for device_id in self.command_targets(device_identifier):
+            # Activate workout state for dynamic metrics
+            state = self.get_workout_state(device_id)
+            state['is_active'] = True
+            state['start_time'] = time.time()
+            state['rep_count'] = 0
+            if device_id in self.device_biometrics:
+                self.device_biometrics[device_id].reset()
+            if device_id in self.device_sessions:
+                self.device_sessions[device_id]['workout_command'] = "start_workout"
+            sent = await self.deliver_command(device_id, "start_workout")
+            logger.info("%s: Start workout (metrics now active)", "Sent to device" if sent else "Queued for resume",
+                        extra={'fields': {'device': device_id}})
     
     async def stop_workout(self, device_identifier):
         """Stop workout for a device or all devices"""
-        device_id = self.resolve_device_id(device_identifier)
-        if device_id is None:
-            return
-            
-        if device_id == "all":
-            for dev_id, websocket in list(self.device_connections.items()):
-                if websocket.open:
-                    await self.send_system_command(websocket, "stop_workout")
-                    # Deactivate workout state
-                    if dev_id in self.device_workout_state:
-                        self.device_workout_state[dev_id]['is_active'] = False
-                        final_reps = self.device_workout_state[dev_id]['rep_count']
-                        final_duration = int(time.time() - self.device_workout_state[dev_id]['start_time'])
-                        print(f"   📊 Final stats for {dev_id[:8]}... → Reps: {final_reps}, Duration: {final_duration}s")
-            print(f"⏹️  Sent to ALL: Stop workout (metrics now passive)")
-        else:
-            websocket = self.device_connections.get(device_id)
-            if websocket and websocket.open:
-                await self.send_system_command(websocket, "stop_workout")
-                # Deactivate workout state
-                if device_id in self.device_workout_state:
-                    self.device_workout_state[device_id]['is_active'] = False
-                    final_reps = self.device_workout_state[device_id]['rep_count']
-                    final_duration = int(time.time() - self.device_workout_state[device_id]['start_time'])
-                    print(f"   📊 Final stats → Reps: {final_reps}, Duration: {final_duration}s")
-                print(f"⏹️  Sent to device: Stop workout (metrics now passive)")
-            else:
-                print(f"❌ Device not found or not connected")
+        for device_id in self.command_targets(device_identifier):
+            self.log_final_stats(device_id)
+            if device_id in self.device_sessions:
+                self.device_sessions[device_id]['workout_command'] = "stop_workout"
+            sent = await self.deliver_command(device_id, "stop_workout")
+            logger.info("%s: Stop workout (metrics now passive)", "Sent to device" if sent else "Queued for resume",
+                        extra={'fields': {'device': device_id}})
     
+    def log_final_stats(self, device_id):
+        """Deactivate workout state and log the device's final stats"""
+        fields = {'device': device_id}
+        if device_id in self.device_workout_state:
+            state = self.device_workout_state[device_id]
+            state['is_active'] = False
+            fields['reps'] = state['rep_count']
+            fields['duration'] = int(time.time() - state['start_time'])
+        if device_id in self.device_biometrics:
+            summary = self.device_biometrics[device_id].summary()
+            fields['heartRateAvg'] = summary['heartRateAvg']
+            fields['heartRateMax'] = summary['heartRateMax']
+            fields['repsPerMinute'] = summary['repsPerMinute']
+        logger.info("Final stats for %s", device_id, extra={'fields': fields})
+
     def list_devices(self):
         """List all connected devices"""
         if not self.device_connections:
@@ -460,25 +1294,29 @@ class FitnessRelayServer:
             print(f"  [{index}] {device_id} - {status}")
             device_list.append(device_id)
         print("=" * 70)
+        stats = self.admission_stats
+        print(f"🛡️  Accepted: {stats['accepted']} | Throttled: {stats['throttled']} | "
+              f"Unknown: {stats['unknown_type']} | Spoofed: {stats['type_mismatch']} | Malformed: {stats['malformed']} | "
+              f"Rejected conns: {stats['rejected_connections']} | Kicked: {stats['disconnected_clients']}")
         print("💡 Tip: Use the index number [1], [2], etc. in commands")
         print("=" * 70 + "\n")
         return device_list
 
+    def get_workout_state(self, device_id):
+        """Get or initialize workout state for this device"""
+        if device_id not in self.device_workout_state:
+            self.device_workout_state[device_id] = {
+                'start_time': time.time(),
+                'rep_count': 0,
+                'base_heart_rate': random.randint(65, 75),
+                'is_active': False
+            }
+        return self.device_workout_state[device_id]
+
     async def send_performance_metrics(self, websocket, device_id):
         """Send dynamic performance metrics to device"""
         try:
-            import random
-            
-            # Get or initialize workout state for this device
-            if device_id not in self.device_workout_state:
-                self.device_workout_state[device_id] = {
-                    'start_time': time.time(),
-                    'rep_count': 0,
-                    'base_heart_rate': random.randint(65, 75),
-                    'is_active': False
-                }
-            
-            state = self.device_workout_state[device_id]
+            state = self.get_workout_state(device_id)
             
             # Calculate dynamic workout duration
             workout_duration = int(time.time() - state['start_time'])
@@ -502,6 +1340,12 @@ class FitnessRelayServer:
                 # Resting heart rate
                 heart_rate = state['base_heart_rate'] + random.randint(-3, 3)
             
+            # A fresh device-reported heart rate beats the simulated one; a stale one is ignored
+            biometrics = self.device_biometrics.get(device_id)
+            device_heart_rate = biometrics.current_heart_rate() if biometrics else 0
+            if device_heart_rate:
+                heart_rate = device_heart_rate
+            
             # Use Firebase values if available, otherwise use calculated values
             final_heart_rate = heart_rate_from_firebase if heart_rate_from_firebase > 0 else heart_rate
             final_rep_count = rep_count_from_firebase if rep_count_from_firebase >= 0 else state['rep_count']
@@ -519,6 +1363,12 @@ class FitnessRelayServer:
                 "caloriesBurned": calories,
                 "timestamp": int(time.time() * 1000)
             }
+            if biometrics:
+                summary = biometrics.summary()
+                for key in ("heartRateAvg", "heartRateMin", "heartRateMax", "rollingHeartRateAvg",
+                            "rollingHeartRateMin", "rollingHeartRateMax", "hrZoneSeconds",
+                            "repsPerMinute", "rollingRepsPerMinute"):
+                    metrics[key] = summary[key]
             
             message = {
                 "type": "performance_metrics",
@@ -527,7 +1377,7 @@ class FitnessRelayServer:
             await websocket.send(json.dumps(message))
             
         except Exception as e:
-            print(f"Error sending metrics: {e}")
+            logger.warning("Error sending metrics: %s", e, extra={'sampled': True})
     
     async def broadcast_periodic_data(self):
         """Continuously send metrics and feedback to connected devices"""
@@ -544,9 +1394,6 @@ class FitnessRelayServer:
                     await self.send_performance_metrics(websocket, device_id)
                     
                     # Send AI feedback occasionally (every 10 seconds)
-                    if not hasattr(self, '_last_feedback_time'):
-                        self._last_feedback_time = {}
-                    
                     if device_id not in self._last_feedback_time or \
                        time.time() - self._last_feedback_time[device_id] > 10:
                         exercises = ["push-ups", "bicep-curls", "lateral-raises", "squats"]
@@ -554,11 +1401,144 @@ class FitnessRelayServer:
                         await self.generate_and_send_feedback(websocket, exercise)
                         self._last_feedback_time[device_id] = time.time()
 
+    # ============================================================================
+    # DASHBOARD SUBSCRIPTIONS - Read-only fleet view for coaches
+    # ============================================================================
+    
+    async def handle_dashboard_subscribe(self, websocket):
+        """Turn an unregistered connection into a read-only dashboard subscriber"""
+        if self.connections.get(websocket, "unknown") != "unknown":
+            logger.warning("Ignoring dashboard_subscribe from device %s", self.connections[websocket])
+            return
+        if not self.dashboard_subscribers:
+            # State isn't tracked while nobody is watching, so catch up first
+            self.update_dashboard_state()
+        self.dashboard_subscribers.add(websocket)
+        self._unregistered.pop(websocket, None)
+        await websocket.send(self.get_dashboard_snapshot_message())
+        logger.info("Dashboard subscribed (%s total)", len(self.dashboard_subscribers))
+
+    async def handle_dashboard_history(self, websocket, data):
+        """Send a subscriber one device's stored heart rate series at the requested resolution"""
+        if websocket not in self.dashboard_subscribers:
+            return
+        device_id = data.get("deviceId", "")
+        resolution = data.get("resolution", "raw")
+        biometrics = self.device_biometrics.get(device_id)
+        samples = biometrics.history(resolution) if biometrics else None
+        if samples is None:
+            samples = []
+        # Samples carry monotonic times; shift them onto the wall clock for clients
+        offset = time.time() - time.monotonic()
+        await websocket.send(json.dumps({
+            "type": "dashboard_history",
+            "payload": {
+                "deviceId": device_id,
+                "resolution": resolution,
+                "samples": [[int((sample[0] + offset) * 1000), *sample[1:]] for sample in samples]
+            }
+        }))
+
+    def build_dashboard_entries(self):
+        """One entry per device session, built once per interval regardless of subscriber count"""
+        entries = {}
+        for device_id, session in self.device_sessions.items():
+            state = self.device_workout_state.get(device_id, {})
+            biometrics = self.device_biometrics.get(device_id)
+            summary = biometrics.summary() if biometrics else {}
+            entries[device_id] = {
+                "index": session['index'],
+                "connected": device_id in self.device_connections,
+                "exercise": session['exercise'],
+                "active": state.get('is_active', False),
+                "repCount": biometrics.rep_count if biometrics else state.get('rep_count', 0),
+                "heartRate": summary.get("heartRate") or self.firebase_data.get('heartRate', 0),
+                "rollingHeartRateAvg": summary.get("rollingHeartRateAvg", 0),
+                "feedback": session['feedback']
+            }
+        return entries
+
+    def update_dashboard_state(self):
+        """Rebuild entries and return (changed, removed) relative to the last published state"""
+        entries = self.build_dashboard_entries()
+        changed = {
+            device_id: entry for device_id, entry in entries.items()
+            if self._dashboard_state.get(device_id) != entry
+        }
+        removed = [device_id for device_id in self._dashboard_state if device_id not in entries]
+        if changed or removed:
+            self._dashboard_state = entries
+            self._dashboard_seq += 1
+            self._dashboard_full_message = None
+        return changed, removed
+
+    def get_dashboard_snapshot_message(self):
+        """Encoded full snapshot, shared by every subscriber until the state changes"""
+        if self._dashboard_full_message is None:
+            self._dashboard_full_message = json.dumps({
+                "type": "dashboard_snapshot",
+                "payload": {
+                    "seq": self._dashboard_seq,
+                    "timestamp": int(time.time() * 1000),
+                    "devices": self._dashboard_state
+                }
+            })
+        return self._dashboard_full_message
+
+    def publish_dashboard_update(self):
+        """Encode this interval's snapshot or delta once and write it to every subscriber; returns the message sent"""
+        if not self.dashboard_subscribers:
+            return None
+        
+        changed, removed = self.update_dashboard_state()
+        self._dashboard_updates += 1
+        if self._dashboard_updates % self.DASHBOARD_FULL_SNAPSHOT_EVERY == 0:
+            message = self.get_dashboard_snapshot_message()
+        elif changed or removed:
+            message = json.dumps({
+                "type": "dashboard_delta",
+                "payload": {
+                    "seq": self._dashboard_seq,
+                    "timestamp": int(time.time() * 1000),
+                    "devices": changed,
+                    "removed": removed
+                }
+            })
+        else:
+            return None
+        # Non-blocking write of the same frame to every subscriber; slow ones don't stall the loop
+        websockets.broadcast(self.dashboard_subscribers, message)
+        return message
+
+    async def broadcast_dashboard(self):
+        """Publish one dashboard update per interval until the server stops"""
+        while True:
+            await asyncio.sleep(self.DASHBOARD_INTERVAL)
+            try:
+                self.publish_dashboard_update()
+            except Exception as e:
+                # A failed interval must not end dashboard updates for the rest of the process
+                logger.error("Error publishing dashboard update: %s", e, extra={'sampled': True})
+
     async def handler(self, websocket, path):
+        # Backstop for upgrades that raced past process_request
+        if len(self.connections) >= self.MAX_CONNECTIONS:
+            self.admission_stats['rejected_connections'] += 1
+            await websocket.close(code=1013, reason="Server at capacity")
+            return
+        
         await self.on_connect(websocket)
         try:
             async for message in websocket:
-                await self.handle_message(websocket, message)
+                verdict, message_type = self.admit_message(websocket, message)
+                if verdict == 'accept':
+                    if websocket in self.dashboard_subscribers and message_type != "dashboard_history":
+                        continue  # Dashboards are read-only
+                    await self.handle_message(websocket, message, message_type)
+                elif verdict == 'disconnect':
+                    logger.warning("Disconnecting %s: rate limit exceeded", self.connections.get(websocket, "unknown"))
+                    await websocket.close(code=1008, reason="Rate limit exceeded")
+                    break
         finally:
             await self.on_disconnect(websocket)
 
@@ -610,8 +1590,12 @@ class FitnessRelayServer:
             print("⏳ Waiting for connections...")
             print("Press Ctrl+C to stop\n")
             
-            async with websockets.serve(self.handler, "0.0.0.0", port, ssl=ssl_context):
-                asyncio.create_task(self.broadcast_periodic_data())
+            async with websockets.serve(self.handler, "0.0.0.0", port, ssl=ssl_context,
+                                        max_size=self.MAX_MESSAGE_SIZE,
+                                        process_request=self.process_request):
+                self.spawn(self.broadcast_periodic_data())
+                self.spawn(self.broadcast_dashboard())
+                self.spawn(self.manage_sessions())
                 await asyncio.Future()  # Run forever
         else:
             # For ngrok mode, we run without SSL (ngrok handles SSL termination)
@@ -657,8 +1641,11 @@ class FitnessRelayServer:
                 print("⏳ Waiting for connections...")
                 print("Press Ctrl+C to stop\n")
             
-            async with websockets.serve(self.handler, "0.0.0.0", port):
-                asyncio.create_task(self.broadcast_periodic_data())
+            async with websockets.serve(self.handler, "0.0.0.0", port, max_size=self.MAX_MESSAGE_SIZE,
+                                        process_request=self.process_request):
+                self.spawn(self.broadcast_periodic_data())
+                self.spawn(self.broadcast_dashboard())
+                self.spawn(self.manage_sessions())
                 await asyncio.Future()  # Run forever
 
 async def run_server_with_commands(server, port, use_ssl, use_ngrok=False):
@@ -682,8 +1669,9 @@ async def run_server_with_commands(server, port, use_ssl, use_ngrok=False):
         
         while True:
             try:
-                # Wait until at least one device is connected before fetching from Firebase
-                if len(server.device_connections) == 0:
+                # Wait until at least one device is connected before fetching from Firebase.
+                # Sessions inside their grace period count, so a Wi-Fi blip doesn't re-send commands.
+                if len(server.device_connections) == 0 and not server.device_sessions:
                     if not device_connected_warning_shown:
                         print("⏳ Waiting for device connection before fetching Firebase data...")
                         device_connected_warning_shown = True
@@ -764,6 +1752,7 @@ if __name__ == "__main__":
     port = 8080
     use_ssl = True  # Use SSL by default
     use_ngrok = False  # Use ngrok for Vercel HTTPS connections
+    log_level = "INFO"
     
     # Parse command line arguments
     for arg in sys.argv[1:]:
@@ -776,6 +1765,8 @@ if __name__ == "__main__":
         elif arg == '--ngrok':
             use_ngrok = True
             use_ssl = False  # ngrok handles SSL termination
+        elif arg.startswith('--log-level='):
+            log_level = arg.split('=', 1)[1]
         elif arg in ['--help', '-h']:
             print("\nUsage: python visualizer_server.py [PORT] [OPTIONS]")
             print("\nOptions:")
@@ -784,6 +1775,7 @@ if __name__ == "__main__":
             print("  --no-ssl    Disable SSL, use plain WS")
             print("  --ngrok     Use ngrok mode (for Vercel HTTPS deployment)")
             print("              Server runs without SSL, ngrok handles HTTPS/WSS")
+            print("  --log-level=LEVEL  DEBUG, INFO (default), WARNING or ERROR")
             print("\nExamples:")
             print("  python visualizer_server.py              # Run on port 8080 with SSL")
             print("  python visualizer_server.py 9000         # Run on port 9000 with SSL")
@@ -797,8 +1789,11 @@ if __name__ == "__main__":
             print("  4. Use that WSS URL in Vercel app's Relay Settings\n")
             exit(0)
     
+    log_writer = setup_logging(log_level)
     server = FitnessRelayServer()
     try:
         asyncio.run(run_server_with_commands(server, port, use_ssl, use_ngrok))
     except KeyboardInterrupt:
         print("\nServer stopped.")
+    finally:
+        log_writer.stop()